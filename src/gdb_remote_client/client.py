@@ -1,6 +1,6 @@
 # SPDX-License-Identifier: MIT
 
-from typing import Tuple, Union
+from typing import List, Tuple, Union
 
 from . import utils
 from .client_base import GdbRemoteClientBase
@@ -68,7 +68,7 @@ class GdbRemoteClient:
         self._client_base.send_ctrl_c()
 
     def get_stop_reply(self) -> Tuple[str, str]:
-        console_text = ""
+        console_chunks: List[str] = []
         while True:
             reply = self._client_base.recv_and_decode_packet_data()
             reply_str = reply.decode("ascii")  # TODO: raise an error?
@@ -76,8 +76,8 @@ class GdbRemoteClient:
                 # Received console output ("O" message). Keep waiting
                 # for the actual stop reply ("W", "T", etc.) that will
                 # arrive later.
-                console_text += utils.ascii_from_hex(reply_str[1:])
+                console_chunks.append(utils.ascii_from_hex(reply_str[1:]))
                 continue
             else:
                 # Stop reply was received.
-                return reply_str, console_text
+                return reply_str, "".join(console_chunks)
@@ -11,8 +11,8 @@ from .errors import ProtocolError, RecvTimeoutError
 class GdbRemoteClientBase:
     # Larger timeout value is used for safety on slower target (e.g. simulations).
     DEFALUT_RECV_TIMEOUT: float = 5.0
-    # Maximum number of bytes to receive from the socket in one go.
-    RECV_BLOCK_SIZE: int = 1024
+    # Minimum free space reserved in the receive buffer for each receive.
+    RECV_BLOCK_SIZE: int = 64 * 1024
     # Maximum size of one received packet - safety limit.
     MAX_RECV_PACKET: int = 128 * 1024
 
@@ -25,8 +25,12 @@ class GdbRemoteClientBase:
         self._port = port
         self._socket: Optional[socket.socket] = None
         self._recv_timeout = self.DEFALUT_RECV_TIMEOUT
-        self._recv_time_start: float = 0.0
-        self._recv_buf = b""
+        self._recv_deadline: Optional[float] = None
+        # Received but not yet consumed data is self._recv_buf[_recv_pos:_recv_end].
+        # The buffer is reused (and grown when needed) for all socket reads.
+        self._recv_buf = bytearray()
+        self._recv_pos = 0
+        self._recv_end = 0
         self._no_ack_mode = False
 
     def set_recv_timeout(self, timeout: float) -> None:
@@ -43,7 +47,7 @@ class GdbRemoteClientBase:
         self._socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
         self._socket.connect((self._host, self._port))
         self._socket.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
-        self._recv_buf = b""
+        # The receive buffer is already empty here: it is cleared on disconnect.
 
         # Each connection starts with ACKs enabled
         self._no_ack_mode = False
@@ -58,7 +62,7 @@ class GdbRemoteClientBase:
                 self._socket.close()
             except socket.error:
                 pass
-        self._recv_buf = b""
+        self._reset_recv_buf()
         self._socket = None
 
     def send_packet(
@@ -76,49 +80,102 @@ class GdbRemoteClientBase:
         assert len(data) > 0
         if self._socket is None:
             raise RuntimeError("Can't send data, not connected")
-        self._socket.send(data)
+        self._socket.sendall(data)
 
-    def _recv_bytes(self, requested: int) -> bytes:
+    def _reset_recv_buf(self) -> None:
+        self._recv_buf = bytearray()
+        self._recv_pos = 0
+        self._recv_end = 0
+
+    def _reserve_recv_space(self, size: int) -> None:
+        # Make sure there is room for at least the given number of bytes
+        # after the end of the unconsumed data.
+        if len(self._recv_buf) - self._recv_end >= size:
+            return
+        # Move the unconsumed data to the start of the buffer
+        pending = self._recv_end - self._recv_pos
+        self._recv_buf[:pending] = self._recv_buf[self._recv_pos : self._recv_end]
+        self._recv_pos = 0
+        self._recv_end = pending
+        if len(self._recv_buf) - self._recv_end < size:
+            self._recv_buf.extend(bytes(self._recv_end + size - len(self._recv_buf)))
+
+    def _fill_recv_buf(self, requested: int) -> None:
+        # Wait until at least the requested number of bytes is available
+        # in the receive buffer.
         assert requested > 0
 
-        if self._socket is None:
+        sock = self._socket
+        if sock is None:
             raise RuntimeError("Can't receive data, not connected")
 
-        while len(self._recv_buf) < requested:
-            timeout_msg = (
-                "Timeout elapsed. Did not manage to receive required data "
-                "within {} sec".format(self._recv_timeout)
-            )
+        while True:
+            missing = requested - (self._recv_end - self._recv_pos)
+            if missing <= 0:
+                break
             # Determine how much time is left to complete the receive operation
             time_left = self._get_recv_time_left()
             if time_left > 0:
-                self._socket.settimeout(time_left)
+                sock.settimeout(time_left)
+                self._reserve_recv_space(max(missing, self.RECV_BLOCK_SIZE))
                 try:
-                    self._recv_buf += self._socket.recv(self.RECV_BLOCK_SIZE)
+                    # Receive directly into the buffer, without a temporary
+                    # bytes object. The view is released right away so that
+                    # the buffer can be resized later.
+                    with memoryview(self._recv_buf)[self._recv_end :] as view:
+                        self._recv_end += sock.recv_into(view)
                 except socket.timeout as e:
                     # Timeout exhausted while blocked on recv()
-                    raise RecvTimeoutError(timeout_msg) from e
+                    raise self._recv_timeout_error() from e
             else:
                 # Timeout exhausted before we even attempted the next recv()
-                raise RecvTimeoutError(timeout_msg)
+                raise self._recv_timeout_error()
+
+    def _recv_timeout_error(self) -> RecvTimeoutError:
+        return RecvTimeoutError(
+            "Timeout elapsed. Did not manage to receive required data "
+            "within {} sec".format(self._recv_timeout)
+        )
 
-        result = self._recv_buf[0:requested]
-        self._recv_buf = self._recv_buf[requested:]
+    def _recv_bytes(self, requested: int) -> bytes:
+        self._fill_recv_buf(requested)
+
+        result = bytes(self._recv_buf[self._recv_pos : self._recv_pos + requested])
+        self._consume_recv_buf(requested)
         return result
 
+    def _recv_bytes_into(self, out: bytearray, requested: int) -> None:
+        # Same as _recv_bytes() but appends the data directly to "out",
+        # without creating an intermediate bytes object.
+        self._fill_recv_buf(requested)
+
+        with memoryview(self._recv_buf) as view:
+            out += view[self._recv_pos : self._recv_pos + requested]
+        self._consume_recv_buf(requested)
+
+    def _consume_recv_buf(self, count: int) -> None:
+        self._recv_pos += count
+        assert self._recv_pos <= self._recv_end
+
+        if self._recv_pos == self._recv_end:
+            # All data consumed, the whole buffer can be reused
+            self._recv_pos = 0
+            self._recv_end = 0
+
     def _recv_byte(self) -> bytes:
         return self._recv_bytes(1)
 
     def _unrecv_bytes(self, b: bytes) -> None:
-        self._recv_buf = b + self._recv_buf
+        self._recv_buf[: self._recv_pos] = b
+        self._recv_end += len(b) - self._recv_pos
+        self._recv_pos = 0
 
     def _start_recv_timeout(self) -> None:
-        self._recv_time_start = time.time()
+        self._recv_deadline = time.monotonic() + self._recv_timeout
 
     def _get_recv_time_left(self) -> float:
-        assert self._recv_time_start > 0.0
-        time_elapsed = time.time() - self._recv_time_start
-        time_left = self._recv_timeout - time_elapsed
+        assert self._recv_deadline is not None
+        time_left = self._recv_deadline - time.monotonic()
         if time_left < 0:
             return 0.0
         elif 0 < time_left < 1.0:
@@ -161,17 +218,24 @@ class GdbRemoteClientBase:
         # For clean recovery from such errors, disconnect and reconnect must
         # be performed.
 
-        packet = b""
         b = self._recv_byte()
         if b != b"$":
             raise ProtocolError(
                 "Unexpected character at the start of packet. Expected '$', found "
                 + repr(b)
             )
-        packet += b
+        packet = bytearray(b)
         while True:
-            b = self._recv_byte()
-            packet += b
+            # Take everything up to the first "#" (inclusive) that is already
+            # in the receive buffer, but no more than one byte over the limit.
+            self._fill_recv_buf(1)
+            end = self._recv_buf.find(b"#", self._recv_pos, self._recv_end)
+            if end < 0:
+                end = self._recv_end
+            else:
+                end += 1
+            end = min(end, self._recv_pos + self.MAX_RECV_PACKET + 1 - len(packet))
+            self._recv_bytes_into(packet, end - self._recv_pos)
 
             if len(packet) > self.MAX_RECV_PACKET:
                 # Safety limit reached
@@ -181,19 +245,20 @@ class GdbRemoteClientBase:
                     )
                 )
 
-            if b == b"#":
+            if packet.endswith(b"#"):
                 # End of packet body
                 break
 
         # Checksum
-        packet += self._recv_bytes(2)
+        self._recv_bytes_into(packet, 2)
+        result = bytes(packet)
 
         if validate_and_ack:
-            utils.validate_packet(packet)
+            utils.validate_packet(result)
             if not self._no_ack_mode:
                 self.send_ack()
 
-        return packet
+        return result
 
     def recv_and_decode_packet_data(self) -> bytes:
         packet = self.recv_packet()
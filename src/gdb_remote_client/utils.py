@@ -1,102 +1,124 @@
 # SPDX-License-Identifier: MIT
 
+import re
 import string
-from typing import Optional, Tuple
+from typing import Iterable, List, Optional, Tuple
 
 from .errors import PacketFormatError
 
+# Two-digit lowercase hex representation of every possible checksum.
+_CHECKSUM_STRINGS = tuple(b"%02x" % i for i in range(256))
+
+# Any character that is not a hex digit.
+_NON_HEX_DIGIT_RE = re.compile("[^0-9a-fA-F]")
+
+# Values of bytes that represent a hex digit.
+_HEX_CHARS = frozenset(string.hexdigits.encode("ascii"))
+
 
 def decode_packet_data(data: bytes) -> bytes:
-    result = b""
+    # Fast path: most packets contain no escape or run-length sequences.
+    if not (0x7D in data or 0x2A in data):  # "}" or "*"
+        return data
+
+    # Only the escape and run-length sequences are handled in Python.
+    # The special bytes are located by bytes.find() and the ordinary bytes
+    # between them are copied as whole runs.
+    size = len(data)
+    result = bytearray()
     pos = 0
-    while pos < len(data):
-        # Peek at the next three bytes.
-        c = data[pos : pos + 3]
-
-        if c[0:1] == b"}":
+    next_escape = -1
+    next_star = -1
+    while True:
+        if next_escape < pos:
+            next_escape = _find_or_end(data, 0x7D, pos)  # "}"
+        if next_star < pos:
+            next_star = _find_or_end(data, 0x2A, pos)  # "*"
+        special = min(next_escape, next_star)
+
+        if special == size:
+            # No more special bytes
+            result += data[pos:]
+            break
+
+        if special == next_escape:
             # Un-escape the next byte.
-            if c[1:2] == b"":
+            if special + 1 == size:
                 raise PacketFormatError("Missing one more character after }")
-            result += _unescape_byte(c[1:2])
-            pos += 2
-        elif c[1:2] == b"*":
-            # Decode run length sequence.
-            if len(c) < 3:
-                raise PacketFormatError(
-                    "Invalid run-length sequence: Missing one more character after *"
-                )
-            result += _expand_run_length_sequence(c)
-            pos += 3
+            result += data[pos:special]
+            result.append(data[special + 1] ^ 0x20)
+            pos = special + 2
+            continue
+
+        if special > pos:
+            # Run-length sequence: the byte before "*" is repeated.
+            start = special - 1
+        elif special + 1 < size and data[special + 1] == 0x2A:
+            # Run-length sequence which repeats "*" itself.
+            start = special
         else:
-            # Ordinary byte - copy it as is.
-            result += c[0:1]
-            pos += 1
+            # "*" right after another sequence - ordinary byte.
+            result.append(0x2A)
+            pos = special + 1
+            continue
 
-    return result
-
-
-def encode_packet_data(data: bytes) -> bytes:
-    result = b""
-    for pos in range(len(data)):
-        c = data[pos : pos + 1]
-        if _needs_escape(c):
-            result += b"}" + _escape_byte(c)
-        else:
-            result += c
-    return result
+        # Decode run length sequence.
+        if start + 2 >= size:
+            raise PacketFormatError(
+                "Invalid run-length sequence: Missing one more character after *"
+            )
+        result += data[pos:start]
+        result += _expand_run_length_sequence(data[start : start + 3])
+        pos = start + 3
 
+    return bytes(result)
 
-def _needs_escape(c: bytes) -> bool:
-    assert len(c) == 1
-    return c in b"}$#"
 
+def _find_or_end(data: bytes, byte: int, start: int) -> int:
+    pos = data.find(byte, start)
+    return pos if pos >= 0 else len(data)
 
-def _escape_byte(c: bytes) -> bytes:
-    assert len(c) == 1
-    return chr(c[0] ^ 0x20).encode("ascii")
 
+def encode_packet_data(data: bytes) -> bytes:
+    # Fast path: most packets contain nothing that needs to be escaped.
+    if not (0x7D in data or 0x24 in data or 0x23 in data):  # "}", "$" or "#"
+        return data
 
-def _unescape_byte(c: bytes) -> bytes:
-    return _escape_byte(c)
+    # Each replace() is a single pass in C. "}" must go first so that
+    # the escape characters inserted by the other two are left alone.
+    return data.replace(b"}", b"}]").replace(b"$", b"}\x04").replace(b"#", b"}\x03")
 
 
 def _expand_run_length_sequence(seq: bytes) -> bytes:
     assert len(seq) == 3
-    assert seq[1:2] == b"*"
+    assert seq[1] == 0x2A  # "*"
 
-    orig_byte = seq[0:1]
-    repetition_byte = seq[2:3]
+    repetition_byte = seq[2]
 
-    if repetition_byte in b"#$":
+    if repetition_byte == 0x23 or repetition_byte == 0x24:  # "#" or "$"
         raise PacketFormatError(
             "Invalid run-length sequence: "
             "Bytes # or $ cannot be used for repetition count"
         )
-    if not (32 <= ord(repetition_byte) <= 126):
+    if not (32 <= repetition_byte <= 126):
         raise PacketFormatError(
             "Invalid run-length sequence: The ASCII code of the run-length "
             "repetiton byte must be in range 32 - 126"
         )
 
-    repetition_count = ord(repetition_byte) - 28
-    return orig_byte * repetition_count
+    repetition_count = repetition_byte - 28
+    return seq[0:1] * repetition_count
 
 
 def compute_checksum(packet_data: bytes) -> bytes:
-    checksum_val = sum(b for b in packet_data) % 256
-    checksum_bytes = bytes("{:02x}".format(checksum_val), "ascii")
-    return checksum_bytes
+    checksum_val = sum(packet_data) & 0xFF
+    return _CHECKSUM_STRINGS[checksum_val]
 
 
 def _check_checksum_syntax(checksum: bytes) -> bool:
-    if len(checksum) != 2:
-        return False
-
-    def is_hex_char(c: int) -> bool:
-        hexdigits = bytes(string.hexdigits, "ascii")
-        return c in hexdigits
-
-    return all(is_hex_char(c) for c in checksum)
+    return (
+        len(checksum) == 2 and checksum[0] in _HEX_CHARS and checksum[1] in _HEX_CHARS
+    )
 
 
 def create_packet(packet_data: bytes, custom_checksum: Optional[bytes] = None) -> bytes:
@@ -105,13 +127,11 @@ def create_packet(packet_data: bytes, custom_checksum: Optional[bytes] = None) -
             raise ValueError("Invalid checksum, expected two hex digits")
 
     packet_data_encoded = encode_packet_data(packet_data)
-    result = b"$" + packet_data_encoded + b"#"
     if custom_checksum is not None:
         checksum = custom_checksum
     else:
         checksum = compute_checksum(packet_data_encoded)
-    result += checksum
-    return result
+    return b"$%s#%s" % (packet_data_encoded, checksum)
 
 
 def split_packet(packet: bytes) -> Tuple[bytes, bytes, bytes, bytes]:
@@ -140,10 +160,11 @@ def validate_packet(packet: bytes) -> None:
             "Expected # character before the checksum, found " + repr(hash_char)
         )
 
-    # Should not happen, but kept here for extra safety:
-    if b"$" in packet_data:
+    # Should not happen, but kept here for extra safety. Both scans run
+    # at memchr speed, negligible compared to the checksum computation below:
+    if 0x24 in packet_data:  # "$"
         raise PacketFormatError("Found special character $ in packet data")
-    if b"#" in packet_data:
+    if 0x23 in packet_data:  # "#"
         raise PacketFormatError("Found special character # in packet data")
 
     if not _check_checksum_syntax(checksum):
@@ -153,8 +174,10 @@ def validate_packet(packet: bytes) -> None:
             + repr(checksum)
         )
 
+    # compute_checksum() gives lowercase hex digits, the received ones
+    # may be in either case.
     checksum_expected = compute_checksum(packet_data)
-    if checksum != checksum_expected:
+    if checksum.lower() != checksum_expected:
         raise PacketFormatError(
             "Packet has invalid checksum. Expected "
             + repr(checksum_expected)
@@ -164,7 +187,32 @@ def validate_packet(packet: bytes) -> None:
         )
 
 
+def validate_packets(packets: Iterable[bytes]) -> List[bool]:
+    # Validity of each of the packets, e.g. of several packets received
+    # back-to-back. Use validate_packet() to find out what is wrong.
+    result = []
+    for packet in packets:
+        try:
+            validate_packet(packet)
+        except PacketFormatError:
+            result.append(False)
+        else:
+            result.append(True)
+    return result
+
+
 def ascii_from_hex(hex_digits: str) -> str:
     if len(hex_digits) % 2 != 0:
         raise ValueError("Expected even number (whole pairs) of hex digits")
-    return bytes.fromhex(hex_digits).decode("ascii")
+    try:
+        data = bytes.fromhex(hex_digits)
+    except ValueError as e:
+        # Only report the first offending character, the input may be long.
+        m = _NON_HEX_DIGIT_RE.search(hex_digits)
+        assert m is not None
+        raise ValueError(
+            "Expected only hex digits, found {!r} at offset {}".format(
+                m.group(0), m.start()
+            )
+        ) from e
+    return data.decode("ascii")
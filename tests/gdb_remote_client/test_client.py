@@ -90,3 +90,41 @@ def test_get_stop_reply_complex(dut):
     assert reply == "T05"
     assert console_out == "a b c\ndef"
     _assert_no_packet_sent(dut)
+
+
+def test_get_stop_reply_odd_console_chunk(dut):
+    incoming_data = [
+        b"O616",  # odd number of hex digits
+        b"T05",
+    ]
+    _mock_incoming_packet_data(dut, incoming_data)
+    with pytest.raises(ValueError) as e:
+        dut.get_stop_reply()
+    assert "Expected even number" in str(e.value)
+    # The stop reply was not read
+    assert dut._client_base.recv_and_decode_packet_data.call_count == 1
+
+
+def test_get_stop_reply_non_hex_console_chunk(dut):
+    incoming_data = [
+        b"Ozz",
+        b"T05",
+    ]
+    _mock_incoming_packet_data(dut, incoming_data)
+    with pytest.raises(ValueError) as e:
+        dut.get_stop_reply()
+    assert "Expected only hex digits" in str(e.value)
+    # The stop reply was not read
+    assert dut._client_base.recv_and_decode_packet_data.call_count == 1
+
+
+def test_get_stop_reply_non_ascii_console_chunk(dut):
+    incoming_data = [
+        b"Off",
+        b"T05",
+    ]
+    _mock_incoming_packet_data(dut, incoming_data)
+    with pytest.raises(UnicodeDecodeError):
+        dut.get_stop_reply()
+    # The stop reply was not read
+    assert dut._client_base.recv_and_decode_packet_data.call_count == 1
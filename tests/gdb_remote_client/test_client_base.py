@@ -4,7 +4,12 @@ from unittest import mock
 
 import pytest
 
-from gdb_remote_client import GdbRemoteClientBase, ProtocolError, RecvTimeoutError
+from gdb_remote_client import (
+    GdbRemoteClientBase,
+    ProtocolError,
+    RecvTimeoutError,
+    utils,
+)
 
 
 @pytest.fixture(autouse=True)
@@ -25,20 +30,36 @@ def dut():
     return inst
 
 
+def _mock_recv_data(dut, recv_data):
+    # Each item of recv_data is returned by one recv_into() call, split up
+    # if it does not fit into the provided buffer.
+    pending = list(recv_data)
+
+    def recv_into(buf):
+        data = pending.pop(0)
+        n = min(len(data), len(buf))
+        buf[:n] = data[:n]
+        if n < len(data):
+            pending.insert(0, data[n:])
+        return n
+
+    dut._socket.recv_into.side_effect = recv_into
+
+
 def _assert_ack_sent(dut):
-    dut._socket.send.assert_called_once_with(b"+")
+    dut._socket.sendall.assert_called_once_with(b"+")
 
 
 def _assert_nack_sent(dut):
-    dut._socket.send.assert_called_once_with(b"-")
+    dut._socket.sendall.assert_called_once_with(b"-")
 
 
 def _assert_ctrl_c_sent(dut):
-    dut._socket.send.assert_called_once_with(b"\x03")
+    dut._socket.sendall.assert_called_once_with(b"\x03")
 
 
 def _assert_nothing_sent(dut):
-    dut._socket.send.assert_not_called()
+    dut._socket.sendall.assert_not_called()
 
 
 def test_connect_disconnect(dut_unconnected):
@@ -77,14 +98,14 @@ def test_recv_packet_unconnected(dut_unconnected):
 def test_send_packet(dut):
     with mock.patch.object(dut, "check_ack"):
         dut.send_packet(b"abc")
-        dut._socket.send.assert_called_once_with(b"$abc#26")
+        dut._socket.sendall.assert_called_once_with(b"$abc#26")
         dut.check_ack.assert_called_once()
 
 
 def test_send_packet_custom_checksum(dut):
     with mock.patch.object(dut, "check_ack"):
         dut.send_packet(b"abc", custom_checksum=b"12")
-        dut._socket.send.assert_called_once_with(b"$abc#12")
+        dut._socket.sendall.assert_called_once_with(b"$abc#12")
         dut.check_ack.assert_called_once()
 
 
@@ -92,28 +113,30 @@ def test_send_packet_no_ack_mode(dut):
     with mock.patch.object(dut, "check_ack"):
         dut.set_no_ack_mode(True)
         dut.send_packet(b"abc")
-        dut._socket.send.assert_called_once_with(b"$abc#26")
+        dut._socket.sendall.assert_called_once_with(b"$abc#26")
         dut.check_ack.assert_not_called()
 
 
 def test_send_packet_explicit_no_ack(dut):
     with mock.patch.object(dut, "check_ack"):
         dut.send_packet(b"abc", check_ack=False)
-        dut._socket.send.assert_called_once_with(b"$abc#26")
+        dut._socket.sendall.assert_called_once_with(b"$abc#26")
         dut.check_ack.assert_not_called()
 
 
 def test_check_ack(dut):
-    dut._socket.recv.return_value = b"+"
+    _mock_recv_data(dut, [b"+"])
     dut.check_ack()
 
-    dut._socket.recv.return_value = b"-"
+    _mock_recv_data(dut, [b"-"])
     with pytest.raises(ProtocolError):
         dut.check_ack()
 
-    dut._socket.recv.return_value = b"garbage"
+    _mock_recv_data(dut, [b"garbage"])
     with pytest.raises(ProtocolError):
         dut.check_ack()
+    # The unexpected character is kept in the receive buffer
+    assert dut._recv_buf[dut._recv_pos : dut._recv_end] == b"garbage"
 
 
 def test_send_ack(dut):
@@ -133,10 +156,10 @@ def test_send_ctrl_c(dut):
 
 def _check_recv_packet(dut, is_no_ack: bool):
     recv_data = [b"$ab", b"c#", b"2", b"6garbage", b"another_mess"]
-    dut._socket.recv.side_effect = recv_data
+    _mock_recv_data(dut, recv_data)
     assert dut.recv_packet() == b"$abc#26"
-    assert dut._socket.recv.call_count == 4
-    assert dut._recv_buf == b"garbage"
+    assert dut._socket.recv_into.call_count == 4
+    assert dut._recv_buf[dut._recv_pos : dut._recv_end] == b"garbage"
     if is_no_ack:
         _assert_nothing_sent(dut)
     else:
@@ -152,9 +175,32 @@ def test_recv_packet_no_ack_mode(dut):
     _check_recv_packet(dut, is_no_ack=True)
 
 
+def test_recv_packet_two_packets_at_once(dut):
+    _mock_recv_data(dut, [b"$abc#26$def#2f"])
+    assert dut.recv_packet() == b"$abc#26"
+    assert dut.recv_packet() == b"$def#2f"
+    assert dut._socket.recv_into.call_count == 1
+
+
+def test_recv_packet_small_blocks(dut):
+    # Forces the receive buffer to be compacted and grown
+    dut.RECV_BLOCK_SIZE = 4
+    _mock_recv_data(dut, [b"$abc#26$de", b"f#2f$", b"#00"])
+    assert dut.recv_packet() == b"$abc#26"
+    assert dut.recv_packet() == b"$def#2f"
+    assert dut.recv_packet() == b"$#00"
+
+
+def test_recv_packet_max_size(dut):
+    body = b"c" * (dut.MAX_RECV_PACKET - 2)
+    packet = utils.create_packet(body)
+    _mock_recv_data(dut, [packet[:100], packet[100:]])
+    assert dut.recv_packet() == packet
+
+
 def test_recv_packet_too_long(dut):
     recv_data = [b"$ab", b"c" * dut.MAX_RECV_PACKET]
-    dut._socket.recv.side_effect = recv_data
+    _mock_recv_data(dut, recv_data)
 
     with pytest.raises(ProtocolError) as e:
         dut.recv_packet()
@@ -163,18 +209,18 @@ def test_recv_packet_too_long(dut):
 
 def test_recv_packet_no_timeout(dut):
     recv_data = [b"$a", b"bc", b"#26"]
-    dut._socket.recv.side_effect = recv_data
+    _mock_recv_data(dut, recv_data)
 
-    with mock.patch("time.time") as time_mock:
+    with mock.patch("time.monotonic") as time_mock:
         time_mock.side_effect = [1000.0, 1001.0, 1002.0, 1003.0]
         dut.recv_packet() == b"$abc#26"
 
 
 def test_recv_packet_timeout_reached(dut):
     recv_data = [b"$a", b"bc", b"#26"]
-    dut._socket.recv.side_effect = recv_data
+    _mock_recv_data(dut, recv_data)
 
-    with mock.patch("time.time") as time_mock:
+    with mock.patch("time.monotonic") as time_mock:
         time_mock.side_effect = [1000.0, 1002.0, 1004.0, 1006.0]
         with pytest.raises(RecvTimeoutError):
             dut.recv_packet()
@@ -182,7 +228,7 @@ def test_recv_packet_timeout_reached(dut):
 
 def test_recv_packet_garbage(dut):
     recv_data = [b"garbage$abc#26"]
-    dut._socket.recv.side_effect = recv_data
+    _mock_recv_data(dut, recv_data)
 
     with pytest.raises(ProtocolError) as e:
         dut.recv_packet()
@@ -190,6 +236,6 @@ def test_recv_packet_garbage(dut):
 
 
 def test_recv_and_decode_packet_data(dut):
-    dut._socket.recv.side_effect = [b"$ab}C", b"d#", b"e7"]
+    _mock_recv_data(dut, [b"$ab}C", b"d#", b"e7"])
     assert dut.recv_and_decode_packet_data() == b"abcd"
     _assert_ack_sent(dut)
@@ -1,5 +1,7 @@
 # SPDX-License-Identifier: MIT
 
+import random
+
 import pytest
 
 from gdb_remote_client import PacketFormatError
@@ -11,6 +13,7 @@ from gdb_remote_client.utils import (
     encode_packet_data,
     split_packet,
     validate_packet,
+    validate_packets,
 )
 
 
@@ -19,6 +22,10 @@ def test_decode_packet_data_plain():
     assert decode_packet_data(b"abc") == b"abc"
     assert decode_packet_data(b"def\x8f") == b"def\x8f"
 
+    # Data without special characters is passed through without a copy
+    data = b"T05thread:01;"
+    assert decode_packet_data(data) is data
+
 
 def test_decode_packet_data_escape():
     assert decode_packet_data(b"jkl}d") == b"jklD"
@@ -27,6 +34,9 @@ def test_decode_packet_data_escape():
     assert decode_packet_data(b"}\x04") == b"$"
     assert decode_packet_data(b"}\x0a") == b"*"
     assert decode_packet_data(b"}]") == b"}"
+    assert decode_packet_data(b"}\xdf") == b"\xff"
+    all_escaped = b"".join(b"}" + bytes([i ^ 0x20]) for i in range(256))
+    assert decode_packet_data(all_escaped) == bytes(range(256))
 
     with pytest.raises(PacketFormatError) as e:
         decode_packet_data(b"abc}")
@@ -36,6 +46,11 @@ def test_decode_packet_data_escape():
 def test_decode_packet_data_run_length():
     assert decode_packet_data(b"a* ") == b"aaaa"
     assert decode_packet_data(b"EFGa*!HIJ") == b"EFGaaaaaHIJ"
+    assert decode_packet_data(b"a* b* ") == b"aaaabbbb"
+    assert decode_packet_data(b"0*~") == b"0" * 98
+    assert decode_packet_data(b'x0*"y') == b"x" + b"0" * 6 + b"y"
+    assert decode_packet_data(b"}]* ") == b"}* "
+    assert decode_packet_data(b"*") == b"*"
 
     with pytest.raises(PacketFormatError) as e:
         decode_packet_data(b"pqr*")
@@ -62,6 +77,19 @@ def test_encode_packet_data():
     assert encode_packet_data(b"") == b""
     assert encode_packet_data(b"abc") == b"abc"
     assert encode_packet_data(b"}$#*") == b"}]}\x04}\x03*"
+    assert encode_packet_data(b"a}b$c#d") == b"a}]b}\x04c}\x03d"
+
+    # Data without special characters is passed through without a copy
+    data = b"vCont;c"
+    assert encode_packet_data(data) is data
+
+
+def test_encode_decode_roundtrip():
+    rnd = random.Random(1234)
+    for _ in range(1000):
+        # "*" is left out: it is not escaped by encode_packet_data()
+        data = bytes(rnd.choice(b"}$#ab\x00\xff") for _ in range(rnd.randint(0, 20)))
+        assert decode_packet_data(encode_packet_data(data)) == data
 
 
 def test_compute_checksum():
@@ -69,17 +97,28 @@ def test_compute_checksum():
     assert compute_checksum(b" ") == b"20"
     assert compute_checksum(b"\x40\x40") == b"80"
     assert compute_checksum(b"abc") == b"26"
+    # Modulo 256
+    assert compute_checksum(b"\xff\x01") == b"00"
+    assert compute_checksum(b"\xff" * 3) == b"fd"
+    # Large data, e.g. a long memory read
+    assert compute_checksum(b"\x01" * (1024 * 1024 + 3)) == b"03"
+    assert compute_checksum(bytes(range(256)) * 4096) == b"00"
 
 
 def test_create_packet():
     assert create_packet(b"") == b"$#00"
     assert create_packet(b"abc") == b"$abc#26"
     assert create_packet(b"abc", custom_checksum=b"11") == b"$abc#11"
+    assert create_packet(b"abc", custom_checksum=b"aF") == b"$abc#aF"
 
     with pytest.raises(ValueError) as e:
         create_packet(b"abc", custom_checksum=b"xx")
     assert "expected two hex digits" in str(e.value)
 
+    with pytest.raises(ValueError) as e:
+        create_packet(b"abc", custom_checksum=b"g0")
+    assert "expected two hex digits" in str(e.value)
+
     with pytest.raises(ValueError) as e:
         create_packet(b"abc", custom_checksum=b"2")
     assert "expected two hex digits" in str(e.value)
@@ -125,10 +164,32 @@ def test_validate_packet():
 
     validate_packet(b"$#00")
     validate_packet(b"$abc#26")
+    validate_packet(b"$}]#da")
+    validate_packet(b"$}]#DA")
+
+
+def test_validate_packets():
+    assert validate_packets([]) == []
+    assert validate_packets([b"$abc#26", b"$abc#27", b"$#00", b"$a#"]) == [
+        True,
+        False,
+        True,
+        False,
+    ]
 
 
 def test_ascii_from_hex():
     assert ascii_from_hex("20616263") == " abc"
+    # Whitespace between the pairs is accepted by bytes.fromhex()
+    assert ascii_from_hex(" 2061 ") == " a"
     with pytest.raises(ValueError) as e:
         ascii_from_hex("202")
     assert "Expected even number" in str(e.value)
+    with pytest.raises(ValueError) as e:
+        ascii_from_hex("2x")
+    assert "Expected only hex digits, found 'x' at offset 1" in str(e.value)
+
+    with pytest.raises(ValueError) as e:
+        ascii_from_hex("20" * 1000 + "zz")
+    assert "found 'z' at offset 2000" in str(e.value)
+    assert len(str(e.value)) < 100